@@ -5,11 +5,12 @@
 """Wrapper over our (QtWebKit) WebView."""
 
 import re
+import logging
 import functools
-import xml.etree.ElementTree
+import collections
 from typing import cast, Iterable, Optional
 
-from qutebrowser.qt.core import pyqtSlot, Qt, QUrl, QPoint, QTimer, QSizeF, QSize
+from qutebrowser.qt.core import pyqtSlot, Qt, QUrl, QPoint, QTimer, QSizeF
 from qutebrowser.qt.gui import QIcon
 from qutebrowser.qt.widgets import QWidget
 # pylint: disable=no-name-in-module
@@ -23,8 +24,19 @@ from qutebrowser.browser.webkit import (webview, webpage, tabhistory, webkitelem
                                         webkitsettings, webkitinspector)
 from qutebrowser.browser.webkit.network import networkmanager
 from qutebrowser.utils import qtutils, usertypes, utils, log, debug, resources
+from qutebrowser.misc import throttle
 from qutebrowser.keyinput import modeman
-from qutebrowser.qt import sip
+
+
+# Matches characters which need to be escaped in a CSS identifier, see
+# https://www.w3.org/TR/CSS2/syndata.html#value-def-identifier
+_ID_ESCAPE_RE = re.compile(r'[^a-zA-Z0-9_-]')
+
+# Matches the href attribute of the first anchor in some selected HTML. Used
+# instead of a full (X)HTML parser, as selected HTML is often not well-formed.
+_ANCHOR_HREF_RE = re.compile(
+    r'<a\b[^>]*\bhref\s*=\s*(["\'])(.*?)\1',
+    re.IGNORECASE | re.DOTALL)
 
 
 class WebKitAction(browsertab.AbstractAction):
@@ -95,19 +107,32 @@ class WebKitSearch(browsertab.AbstractSearch):
 
     _widget: webview.WebView
 
+    # Operations on QFlags return new instances, so sharing one zero value
+    # between all searches is safe.
+    _EMPTY_FLAGS = QWebPage.FindFlags(0)  # type: ignore[call-overload]
+
     def __init__(self, tab, parent=None):
         super().__init__(tab, parent)
         self._flags = self._empty_flags()
+        # findText() searches the whole page synchronously, so we debounce
+        # rapid-fire searches (incremental typing) into a single one.
+        self._pending_args = None
+        self._search_timer = usertypes.Timer(self, 'search-debounce')
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(50)
+        self._search_timer.timeout.connect(self._do_search)
 
     def _empty_flags(self):
-        return QWebPage.FindFlags(0)  # type: ignore[call-overload]
+        return self._EMPTY_FLAGS
 
     def _args_to_flags(self, reverse, ignore_case):
+        # Binary (not in-place) operators, so the shared _EMPTY_FLAGS value
+        # never gets modified.
         flags = self._empty_flags()
         if self._is_case_sensitive(ignore_case):
-            flags |= QWebPage.FindFlag.FindCaseSensitively
+            flags = flags | QWebPage.FindFlag.FindCaseSensitively
         if reverse:
-            flags |= QWebPage.FindFlag.FindBackward
+            flags = flags | QWebPage.FindFlag.FindBackward
         return flags
 
     def _call_cb(self, callback, found, text, flags, caller):
@@ -122,18 +147,21 @@ class WebKitSearch(browsertab.AbstractSearch):
             flags: The flags searched with
             caller: Name of the caller.
         """
-        found_text = 'found' if found else "didn't find"
-        # Removing FindWrapsAroundDocument to get the same logging as with
-        # QtWebEngine
-        debug_flags = debug.qflags_key(
-            QWebPage, flags & ~QWebPage.FindFlag.FindWrapsAroundDocument,
-            klass=QWebPage.FindFlag)
-        if debug_flags != '0x0000':
-            flag_text = 'with flags {}'.format(debug_flags)
-        else:
-            flag_text = ''
-        log.webview.debug(' '.join([caller, found_text, text, flag_text])
-                          .strip())
+        if log.webview.isEnabledFor(logging.DEBUG):
+            # Formatting the flags is not exactly cheap, and this runs on
+            # every search keystroke.
+            found_text = 'found' if found else "didn't find"
+            # Removing FindWrapsAroundDocument to get the same logging as with
+            # QtWebEngine
+            debug_flags = debug.qflags_key(
+                QWebPage, flags & ~QWebPage.FindFlag.FindWrapsAroundDocument,
+                klass=QWebPage.FindFlag)
+            if debug_flags != '0x0000':
+                flag_text = 'with flags {}'.format(debug_flags)
+            else:
+                flag_text = ''
+            log.webview.debug(' '.join([caller, found_text, text, flag_text])
+                              .strip())
         if callback is not None:
             if caller in ["prev_result", "next_result"]:
                 if found:
@@ -147,13 +175,23 @@ class WebKitSearch(browsertab.AbstractSearch):
                 cb_value = found
             else:
                 raise utils.Unreachable(caller)
-            QTimer.singleShot(0, functools.partial(callback, cb_value))
+            if caller == "search" and not found:
+                # Nothing was marked or highlighted, so there's no need to
+                # wait for a re-render before calling back.
+                callback(cb_value)
+            else:
+                QTimer.singleShot(0, lambda: callback(cb_value))
 
         self.finished.emit(found)
 
     def clear(self):
-        if self.search_displayed:
-            self.cleared.emit()
+        self._pending_args = None
+        self._search_timer.stop()
+        if not self.search_displayed:
+            # Nothing marked or highlighted, so nothing to clean up in the
+            # page either.
+            return
+        self.cleared.emit()
         self.search_displayed = False
         # We first clear the marked text, then the highlights
         self._widget.findText('')
@@ -162,6 +200,27 @@ class WebKitSearch(browsertab.AbstractSearch):
 
     def search(self, text, *, ignore_case=usertypes.IgnoreCase.never,
                reverse=False, result_cb=None):
+        self._pending_args = (text, ignore_case, reverse, result_cb)
+        self._search_timer.start()
+
+    def _flush_search(self):
+        """Run a pending debounced search immediately.
+
+        Navigating results relies on self.text and the mark set by the last
+        findText() call, so a search still sitting in the debounce timer has
+        to happen before them.
+        """
+        if self._pending_args is not None:
+            self._search_timer.stop()
+            self._do_search()
+
+    @pyqtSlot()
+    def _do_search(self):
+        """Run the latest debounced search request."""
+        assert self._pending_args is not None
+        text, ignore_case, reverse, result_cb = self._pending_args
+        self._pending_args = None
+
         # Don't go to next entry on duplicate search
         if self.text == text and self.search_displayed:
             log.webview.debug("Ignoring duplicate search request"
@@ -169,44 +228,41 @@ class WebKitSearch(browsertab.AbstractSearch):
             self._flags = self._args_to_flags(reverse, ignore_case)
             return
 
+        self._flags = self._args_to_flags(reverse, ignore_case)
+
         # Clear old search results, this is done automatically on QtWebEngine.
         self.clear()
 
         self.text = text
         self.search_displayed = True
-        self._flags = self._args_to_flags(reverse, ignore_case)
         # We actually search *twice* - once to highlight everything, then again
         # to get a mark so we can navigate.
         found = self._widget.findText(text, self._flags)
-        self._widget.findText(text,
-                              self._flags | QWebPage.FindFlag.HighlightAllOccurrences)
+        self._widget.findText(
+            text, self._flags | QWebPage.FindFlag.HighlightAllOccurrences)
         self._call_cb(result_cb, found, text, self._flags, 'search')
 
     def next_result(self, *, wrap=False, callback=None):
+        self._flush_search()
         self.search_displayed = True
-        # The int() here makes sure we get a copy of the flags.
-        flags = QWebPage.FindFlags(
-            int(self._flags))  # type: ignore[call-overload]
-
+        # Binary operators on QFlags return a new instance, so as long as we
+        # avoid in-place operators, self._flags stays untouched and no
+        # explicit copy is needed.
+        flags = self._flags
         if wrap:
-            flags |= QWebPage.FindFlag.FindWrapsAroundDocument
+            flags = flags | QWebPage.FindFlag.FindWrapsAroundDocument
 
         found = self._widget.findText(self.text, flags)  # type: ignore[arg-type]
         self._call_cb(callback, found, self.text, flags, 'next_result')
 
     def prev_result(self, *, wrap=False, callback=None):
+        self._flush_search()
         self.search_displayed = True
-        # The int() here makes sure we get a copy of the flags.
-        flags = QWebPage.FindFlags(
-            int(self._flags))  # type: ignore[call-overload]
-
-        if flags & QWebPage.FindFlag.FindBackward:
-            flags &= ~QWebPage.FindFlag.FindBackward
-        else:
-            flags |= QWebPage.FindFlag.FindBackward
-
+        # XOR toggles the search direction; as a binary operator it returns a
+        # new QFlags instance, so self._flags stays untouched.
+        flags = self._flags ^ QWebPage.FindFlag.FindBackward
         if wrap:
-            flags |= QWebPage.FindFlag.FindWrapsAroundDocument
+            flags = flags | QWebPage.FindFlag.FindWrapsAroundDocument
 
         found = self._widget.findText(self.text, flags)  # type: ignore[arg-type]
         self._call_cb(callback, found, self.text, flags, 'prev_result')
@@ -269,8 +325,9 @@ class WebKitCaret(browsertab.AbstractCaret):
             act = QWebPage.WebAction.SelectNextLine
         else:
             act = QWebPage.WebAction.MoveToNextLine
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
-            self._widget.triggerPageAction(act)
+            trigger(act)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_end()
 
@@ -279,8 +336,9 @@ class WebKitCaret(browsertab.AbstractCaret):
             act = QWebPage.WebAction.SelectPreviousLine
         else:
             act = QWebPage.WebAction.MoveToPreviousLine
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
-            self._widget.triggerPageAction(act)
+            trigger(act)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_start()
 
@@ -291,8 +349,9 @@ class WebKitCaret(browsertab.AbstractCaret):
             return
         else:
             act = QWebPage.WebAction.MoveToNextChar
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
-            self._widget.triggerPageAction(act)
+            trigger(act)
 
     def move_to_prev_char(self, count=1):
         if self._selection_state is browsertab.SelectionState.normal:
@@ -301,8 +360,9 @@ class WebKitCaret(browsertab.AbstractCaret):
             return
         else:
             act = QWebPage.WebAction.MoveToPreviousChar
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
-            self._widget.triggerPageAction(act)
+            trigger(act)
 
     def move_to_end_of_word(self, count=1):
         if self._selection_state is browsertab.SelectionState.normal:
@@ -315,9 +375,10 @@ class WebKitCaret(browsertab.AbstractCaret):
             act = [QWebPage.WebAction.MoveToNextWord]
             if utils.is_windows:  # pragma: no cover
                 act.append(QWebPage.WebAction.MoveToPreviousChar)
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
 
     def move_to_next_word(self, count=1):
         if self._selection_state is browsertab.SelectionState.normal:
@@ -330,9 +391,10 @@ class WebKitCaret(browsertab.AbstractCaret):
             act = [QWebPage.WebAction.MoveToNextWord]
             if not utils.is_windows:  # pragma: no branch
                 act.append(QWebPage.WebAction.MoveToNextChar)
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
 
     def move_to_prev_word(self, count=1):
         if self._selection_state is browsertab.SelectionState.normal:
@@ -341,8 +403,9 @@ class WebKitCaret(browsertab.AbstractCaret):
             return
         else:
             act = QWebPage.WebAction.MoveToPreviousWord
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
-            self._widget.triggerPageAction(act)
+            trigger(act)
 
     def move_to_start_of_line(self):
         if self._selection_state is browsertab.SelectionState.normal:
@@ -369,9 +432,10 @@ class WebKitCaret(browsertab.AbstractCaret):
         else:
             act = [QWebPage.WebAction.MoveToNextLine,
                    QWebPage.WebAction.MoveToStartOfBlock]
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_end()
 
@@ -382,9 +446,10 @@ class WebKitCaret(browsertab.AbstractCaret):
         else:
             act = [QWebPage.WebAction.MoveToPreviousLine,
                    QWebPage.WebAction.MoveToStartOfBlock]
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_start()
 
@@ -395,9 +460,10 @@ class WebKitCaret(browsertab.AbstractCaret):
         else:
             act = [QWebPage.WebAction.MoveToNextLine,
                    QWebPage.WebAction.MoveToEndOfBlock]
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_end()
 
@@ -406,9 +472,10 @@ class WebKitCaret(browsertab.AbstractCaret):
             act = [QWebPage.WebAction.SelectPreviousLine, QWebPage.WebAction.SelectEndOfBlock]
         else:
             act = [QWebPage.WebAction.MoveToPreviousLine, QWebPage.WebAction.MoveToEndOfBlock]
+        trigger = self._widget.triggerPageAction
         for _ in range(count):
             for a in act:
-                self._widget.triggerPageAction(a)
+                trigger(a)
         if self._selection_state is browsertab.SelectionState.line:
             self._select_line_to_start()
 
@@ -431,10 +498,7 @@ class WebKitCaret(browsertab.AbstractCaret):
     def toggle_selection(self, line=False):
         if line:
             self._selection_state = browsertab.SelectionState.line
-            self._select_line()
-            self.reverse_selection()
-            self._select_line()
-            self.reverse_selection()
+            self._select_whole_line()
         elif self._selection_state is not browsertab.SelectionState.normal:
             self._selection_state = browsertab.SelectionState.normal
         else:
@@ -448,7 +512,9 @@ class WebKitCaret(browsertab.AbstractCaret):
         callback(self._widget.selectedText())
 
     def reverse_selection(self):
-        self._tab.run_js_async("""{
+        # Has to happen synchronously, as callers (and chained commands)
+        # issue page actions right afterwards which act on the selection.
+        self._tab.private_api.run_js_sync("""{
             const sel = window.getSelection();
             sel.setBaseAndExtent(
                 sel.extentNode, sel.extentOffset, sel.baseNode,
@@ -457,30 +523,60 @@ class WebKitCaret(browsertab.AbstractCaret):
         }""")
 
     def _select_line(self):
-        self._widget.triggerPageAction(QWebPage.WebAction.SelectStartOfLine)
-        self.reverse_selection()
-        self._widget.triggerPageAction(QWebPage.WebAction.SelectEndOfLine)
-        self.reverse_selection()
+        # Extend both ends of the selection to their line boundaries. The
+        # former SelectStartOfLine/SelectEndOfLine page actions interleaved
+        # with reverse_selection() can't be used anymore, as the page actions
+        # are synchronous while reverse_selection() goes through the deferred
+        # run_js_async(), so both actions would run before either swap.
+        self._tab.private_api.run_js_sync("""{
+            const sel = window.getSelection();
+            sel.modify('extend', 'backward', 'lineboundary');
+            sel.setBaseAndExtent(
+                sel.extentNode, sel.extentOffset, sel.baseNode,
+                sel.baseOffset
+            );
+            sel.modify('extend', 'forward', 'lineboundary');
+            sel.setBaseAndExtent(
+                sel.extentNode, sel.extentOffset, sel.baseNode,
+                sel.baseOffset
+            );
+        }""")
+
+    def _select_whole_line(self):
+        # Doing this via page actions and reverse_selection() takes several
+        # synchronous JS round-trips; one Selection.modify() script does the
+        # same in a single one.
+        self._tab.private_api.run_js_sync("""{
+            const sel = window.getSelection();
+            sel.modify('move', 'backward', 'lineboundary');
+            sel.modify('extend', 'forward', 'lineboundary');
+        }""")
 
     def _select_line_to_end(self):
-        # direction of selection (if anchor is to the left or right
-        # of focus) has to be checked before moving selection
-        # to the end of line
-        if self._js_selection_left_to_right():
-            self._widget.triggerPageAction(QWebPage.WebAction.SelectEndOfLine)
+        # The direction of the selection (if the anchor is to the left or
+        # right of the focus) has to be checked before extending it to the
+        # end of the line. Doing both in one script avoids a second
+        # synchronous JS round-trip.
+        self._tab.private_api.run_js_sync("""{
+            const sel = window.getSelection();
+            const position =
+                sel.anchorNode.compareDocumentPosition(sel.focusNode);
+            if (!position && sel.anchorOffset < sel.focusOffset ||
+                    position === Node.DOCUMENT_POSITION_FOLLOWING) {
+                sel.modify('extend', 'forward', 'lineboundary');
+            }
+        }""")
 
     def _select_line_to_start(self):
-        if not self._js_selection_left_to_right():
-            self._widget.triggerPageAction(QWebPage.WebAction.SelectStartOfLine)
-
-    def _js_selection_left_to_right(self):
-        """Return True iff the selection's direction is left to right."""
-        return self._tab.private_api.run_js_sync("""
-            var sel = window.getSelection();
-            var position = sel.anchorNode.compareDocumentPosition(sel.focusNode);
-            (!position && sel.anchorOffset < sel.focusOffset ||
-                position === Node.DOCUMENT_POSITION_FOLLOWING);
-        """)
+        self._tab.private_api.run_js_sync("""{
+            const sel = window.getSelection();
+            const position =
+                sel.anchorNode.compareDocumentPosition(sel.focusNode);
+            if (!(!position && sel.anchorOffset < sel.focusOffset ||
+                    position === Node.DOCUMENT_POSITION_FOLLOWING)) {
+                sel.modify('extend', 'backward', 'lineboundary');
+            }
+        }""")
 
     def _follow_selected(self, *, tab=False):
         if QWebSettings.globalSettings().testAttribute(
@@ -504,24 +600,18 @@ class WebKitCaret(browsertab.AbstractCaret):
                 # TODO find a way to check if something is focused
                 self._follow_enter(tab)
                 return
-            try:
-                selected_element = xml.etree.ElementTree.fromstring(
-                    '<html>{}</html>'.format(selection)).find('a')
-            except xml.etree.ElementTree.ParseError:
-                raise browsertab.WebTabError('Could not parse selected '
-                                             'element!')
-
-            if selected_element is not None:
-                try:
-                    href = selected_element.attrib['href']
-                except KeyError:
-                    raise browsertab.WebTabError('Anchor element without '
-                                                 'href!')
-                url = self._tab.url().resolved(QUrl(href))
-                if tab:
-                    self._tab.new_tab_requested.emit(url)
-                else:
-                    self._tab.load_url(url)
+            match = _ANCHOR_HREF_RE.search(selection)
+            if match is None:
+                # No anchor with a href in the selection, so maybe something
+                # else (e.g. a form element) is focused.
+                self._follow_enter(tab)
+                return
+
+            url = self._tab.url().resolved(QUrl(match.group(2)))
+            if tab:
+                self._tab.new_tab_requested.emit(url)
+            else:
+                self._tab.load_url(url)
 
     def follow_selected(self, *, tab=False):
         try:
@@ -548,22 +638,25 @@ class WebKitScroller(browsertab.AbstractScroller):
 
     _widget: webview.WebView
 
+    def _mainframe(self):
+        return self._widget.page().mainFrame()
+
     def pos_px(self):
-        return self._widget.page().mainFrame().scrollPosition()
+        return self._mainframe().scrollPosition()
 
     def pos_perc(self):
         return self._widget.scroll_pos
 
     def to_point(self, point):
-        self._widget.page().mainFrame().setScrollPosition(point)
+        self._mainframe().setScrollPosition(point)
 
     def to_anchor(self, name):
-        self._widget.page().mainFrame().scrollToAnchor(name)
+        self._mainframe().scrollToAnchor(name)
 
     def delta(self, x: int = 0, y: int = 0) -> None:
         qtutils.check_overflow(x, 'int')
         qtutils.check_overflow(y, 'int')
-        self._widget.page().mainFrame().scroll(x, y)
+        self._mainframe().scroll(x, y)
 
     def delta_page(self, x: float = 0.0, y: float = 0.0) -> None:
         if y.is_integer():
@@ -577,8 +670,13 @@ class WebKitScroller(browsertab.AbstractScroller):
             y = 0
         if x == 0 and y == 0:
             return
-        size = self._widget.page().mainFrame().geometry()
-        self.delta(int(x * size.width()), int(y * size.height()))
+        frame = self._mainframe()
+        size = frame.geometry()
+        dx = int(x * size.width())
+        dy = int(y * size.height())
+        qtutils.check_overflow(dx, 'int')
+        qtutils.check_overflow(dy, 'int')
+        frame.scroll(dx, dy)
 
     def to_perc(self, x=None, y=None):
         if x is None and y == 0:
@@ -586,9 +684,9 @@ class WebKitScroller(browsertab.AbstractScroller):
         elif x is None and y == 100:
             self.bottom()
         else:
+            frame = self._mainframe()
             for val, orientation in [(x, Qt.Orientation.Horizontal), (y, Qt.Orientation.Vertical)]:
                 if val is not None:
-                    frame = self._widget.page().mainFrame()
                     maximum = frame.scrollBarMaximum(orientation)
                     if maximum == 0:
                         continue
@@ -597,18 +695,21 @@ class WebKitScroller(browsertab.AbstractScroller):
                     frame.setScrollBarValue(orientation, pos)
 
     def _key_press(self, key, count=1, getter_name=None, direction=None):
-        frame = self._widget.page().mainFrame()
+        if count <= 0:
+            return
+        frame = self._mainframe()
         getter = None if getter_name is None else getattr(frame, getter_name)
 
         # FIXME:qtwebengine needed?
         # self._widget.setFocus()
 
+        fake_key_press = self._tab.fake_key_press
         for _ in range(min(count, 5000)):
             # Abort scrolling if the minimum/maximum was reached.
             if (getter is not None and
                     frame.scrollBarValue(direction) == getter(direction)):
                 return
-            self._tab.fake_key_press(key)
+            fake_key_press(key)
 
     def up(self, count=1):
         self._key_press(Qt.Key.Key_Up, count, 'scrollBarMinimum', Qt.Orientation.Vertical)
@@ -660,8 +761,9 @@ class WebKitHistoryPrivate(browsertab.AbstractHistoryPrivate):
         qtutils.deserialize(data, self._history)
 
     def load_items(self, items):
-        if items:
-            self._tab.before_load_started.emit(items[-1].url)
+        if not items:
+            return
+        self._tab.before_load_started.emit(items[-1].url)
 
         stream, _data, user_data = tabhistory.serialize(items)
         qtutils.deserialize_stream(stream, self._history)
@@ -725,23 +827,56 @@ class WebKitElements(browsertab.AbstractElements):
     _tab: 'WebKitTab'
     _widget: webview.WebView
 
+    def __init__(self, tab: 'WebKitTab') -> None:
+        super().__init__(tab)
+        # Cached result of webkitelem.get_child_frames(), so that successive
+        # lookups (e.g. multiple selectors in hint mode) don't re-walk an
+        # unchanged frame tree. Invalidated when frames are created/reloaded.
+        self._frames_cache: Optional[list] = None
+
+    def _invalidate_frames_cache(self, *_args):
+        """Invalidate the cached frame tree after it changed."""
+        frames = self._frames_cache
+        self._frames_cache = None
+        if frames is None:
+            return
+        for frame in frames:
+            try:
+                frame.destroyed.disconnect(self._invalidate_frames_cache)
+            except RuntimeError:
+                # The frame is already destroyed, which took its connection
+                # with it.
+                pass
+
     def find_css(self, selector, callback, error_cb, *, only_visible=False):
         utils.unused(error_cb)
         mainframe = self._widget.page().mainFrame()
         if mainframe is None:
             raise browsertab.WebTabError("No frame focused!")
 
+        frames = self._frames_cache
+        if frames is None:
+            frames = self._frames_cache = webkitelem.get_child_frames(mainframe)
+            for frame in frames:
+                # Child frames can die without frameCreated or a main-frame
+                # loadStarted firing (e.g. JS removing an iframe), which
+                # would leave dead wrappers in the cache. The connections
+                # are undone again when the cache gets invalidated.
+                frame.destroyed.connect(self._invalidate_frames_cache)
+
+        tab = self._tab
         elems = []
-        frames = webkitelem.get_child_frames(mainframe)
         for f in frames:
             frame_elems = cast(Iterable[QWebElement], f.findAllElements(selector))
-            for elem in frame_elems:
-                elems.append(webkitelem.WebKitElement(elem, tab=self._tab))
-
-        if only_visible:
-            # pylint: disable=protected-access
-            elems = [e for e in elems if e._is_visible(mainframe)]
-            # pylint: enable=protected-access
+            for qelem in frame_elems:
+                elem = webkitelem.WebKitElement(qelem, tab=tab)
+                # Filtering directly here avoids a second pass over the
+                # (potentially long) element list.
+                # pylint: disable=protected-access
+                if only_visible and not elem._is_visible(mainframe):
+                    continue
+                # pylint: enable=protected-access
+                elems.append(elem)
 
         callback(elems)
 
@@ -754,8 +889,7 @@ class WebKitElements(browsertab.AbstractElements):
                 callback(elems[0])
 
         # Escape non-alphanumeric characters in the selector
-        # https://www.w3.org/TR/CSS2/syndata.html#value-def-identifier
-        elem_id = re.sub(r'[^a-zA-Z0-9_-]', r'\\\g<0>', elem_id)
+        elem_id = _ID_ESCAPE_RE.sub(r'\\\g<0>', elem_id)
         self.find_css('#' + elem_id, find_id_cb, error_cb=lambda exc: None)
 
     def find_focused(self, callback):
@@ -828,7 +962,8 @@ class WebKitTabPrivate(browsertab.AbstractTabPrivate):
     _widget: webview.WebView
 
     def networkaccessmanager(self):
-        return self._widget.page().networkAccessManager()
+        # pylint: disable=protected-access
+        return self._tab._page.networkAccessManager()
 
     def clear_ssl_errors(self):
         self.networkaccessmanager().clear_all_ssl_errors()
@@ -837,10 +972,19 @@ class WebKitTabPrivate(browsertab.AbstractTabPrivate):
         return self._widget
 
     def shutdown(self):
+        # Disconnecting here means a deleted widget can never reach
+        # _on_webkit_icon_changed, so the slot doesn't need a liveness check
+        # on every icon update.
+        try:
+            self._widget.iconChanged.disconnect(
+                self._tab._on_webkit_icon_changed)  # pylint: disable=protected-access
+        except TypeError:
+            pass
         self._widget.shutdown()
 
     def run_js_sync(self, code):
-        document_element = self._widget.page().mainFrame().documentElement()
+        # pylint: disable=protected-access
+        document_element = self._tab._main_frame.documentElement()
         result = document_element.evaluateJavaScript(code)
         return result
 
@@ -877,6 +1021,17 @@ class WebKitTab(browsertab.AbstractTab):
                                             tab=self)
         # We're assigning settings in _set_widget
         self.settings = webkitsettings.WebKitSettings(settings=None)
+        # Interactive resizing/zooming fires contentsSizeChanged once per
+        # rendered frame, so forward at most one size per ~vsync.
+        self._throttled_contents_size = throttle.Throttle(
+            self._emit_contents_size, delay_ms=16, parent=self)
+        # Hovering and scrolling fire at device-input rates; clamp what
+        # Python-side consumers (statusbar etc.) have to handle to ~60 Hz.
+        self._throttled_link_hovered = throttle.Throttle(
+            self.link_hovered.emit, delay_ms=16, parent=self)
+        self._throttled_scroll_pos = throttle.Throttle(
+            self.scroller.perc_changed.emit, delay_ms=16, parent=self)
+        self._pending_js: collections.deque = collections.deque()
         self._set_widget(widget)
         self._connect_signals()
         self.backend = usertypes.Backend.QtWebKit
@@ -893,14 +1048,14 @@ class WebKitTab(browsertab.AbstractTab):
         self._widget.load(url)
 
     def url(self, *, requested=False):
-        frame = self._widget.page().mainFrame()
+        frame = self._main_frame
         if requested:
             return frame.requestedUrl()
         else:
             return frame.url()
 
     def dump_async(self, callback, *, plain=False):
-        frame = self._widget.page().mainFrame()
+        frame = self._main_frame
         if plain:
             callback(frame.toPlainText())
         else:
@@ -909,9 +1064,23 @@ class WebKitTab(browsertab.AbstractTab):
     def run_js_async(self, code, callback=None, *, world=None):
         if world is not None and world != usertypes.JsWorld.jseval:
             log.webview.warning("Ignoring world ID {}".format(world))
-        result = self.private_api.run_js_sync(code)
-        if callback is not None:
-            callback(result)
+        # Actually run the JS on the next event loop iteration, so that a
+        # burst of run_js_async calls doesn't block the UI (and to match the
+        # asynchronous QtWebEngine behavior). With the bound method as the
+        # timeout target, Qt tracks us as the receiver - the C++-side weak
+        # reference means queued scripts are simply dropped if the tab gets
+        # deleted first, with no per-call liveness polling needed.
+        self._pending_js.append((code, callback))
+        QTimer.singleShot(0, self._run_pending_js)
+
+    @pyqtSlot()
+    def _run_pending_js(self):
+        """Run JS queued by run_js_async and call the callbacks."""
+        while self._pending_js:
+            code, callback = self._pending_js.popleft()
+            result = self.private_api.run_js_sync(code)
+            if callback is not None:
+                callback(result)
 
     def icon(self):
         return self._widget.icon()
@@ -944,47 +1113,42 @@ class WebKitTab(browsertab.AbstractTab):
     @pyqtSlot()
     def _on_load_started(self):
         super()._on_load_started()
-        nam = self._widget.page().networkAccessManager()
-        assert isinstance(nam, networkmanager.NetworkManager), nam
-        nam.netrc_used = False
+        self._nam.netrc_used = False
         # Make sure the icon is cleared when navigating to a page without one.
         self.icon_changed.emit(QIcon())
 
-    @pyqtSlot(bool)
-    def _on_load_finished(self, ok: bool) -> None:
-        super()._on_load_finished(ok)
-        self._update_load_status(ok)
-
     @pyqtSlot()
-    def _on_frame_load_finished(self):
+    def _on_load_finished(self) -> None:  # pylint: disable=arguments-differ
         """Make sure we emit an appropriate status when loading finished.
 
         While Qt has a bool "ok" attribute for loadFinished, it always is True
         when using error pages... See
         https://github.com/qutebrowser/qutebrowser/issues/84
+
+        Thus, loadFinished is connected here directly and Qt's "ok" value
+        ignored in favor of the page's error flag, without the extra
+        _on_frame_load_finished hop this used to take.
         """
-        page = self._widget.page()
+        page = self._page
         assert isinstance(page, webpage.BrowserPage), page
-        self._on_load_finished(not page.error_occurred)
+        ok = not page.error_occurred
+        super()._on_load_finished(ok)
+        self._update_load_status(ok)
 
     @pyqtSlot()
     def _on_webkit_icon_changed(self):
         """Emit iconChanged with a QIcon like QWebEngineView does."""
-        if sip.isdeleted(self._widget):
-            log.webview.debug("Got _on_webkit_icon_changed for deleted view!")
-            return
+        # No liveness check needed, as the signal gets disconnected from this
+        # slot on shutdown.
         self.icon_changed.emit(self._widget.icon())
 
-    @pyqtSlot(QWebFrame)
-    def _on_frame_created(self, frame):
-        """Connect the contentsSizeChanged signal of each frame."""
-        # FIXME:qtwebengine those could theoretically regress:
-        # https://github.com/qutebrowser/qutebrowser/issues/152
-        # https://github.com/qutebrowser/qutebrowser/issues/263
-        frame.contentsSizeChanged.connect(self._on_contents_size_changed)
+    @pyqtSlot(str, str, str)
+    def _on_link_hovered(self, link, _title, _text):
+        self._throttled_link_hovered(link)
 
-    @pyqtSlot(QSize)
-    def _on_contents_size_changed(self, size):
+    def _emit_contents_size(self, size):
+        # The QSize -> QSizeF conversion only happens here, i.e. at most once
+        # per throttle window instead of once per Qt signal.
         self.contents_size_changed.emit(QSizeF(size))
 
     @pyqtSlot(usertypes.NavigationRequest)
@@ -1020,30 +1184,50 @@ class WebKitTab(browsertab.AbstractTab):
         view = self._widget
         page = view.page()
         frame = page.mainFrame()
-        page.windowCloseRequested.connect(  # type: ignore[attr-defined]
-            self.window_close_requested)
-        page.linkHovered.connect(  # type: ignore[attr-defined]
-            self.link_hovered)
-        page.loadProgress.connect(  # type: ignore[attr-defined]
-            self._on_load_progress)
-        frame.loadStarted.connect(  # type: ignore[attr-defined]
-            self._on_load_started)
-        view.scroll_pos_changed.connect(self.scroller.perc_changed)
-        view.titleChanged.connect(  # type: ignore[attr-defined]
-            self.title_changed)
-        view.urlChanged.connect(  # type: ignore[attr-defined]
-            self._on_url_changed)
-        view.shutting_down.connect(self.shutting_down)
-        page.networkAccessManager().sslErrors.connect(self._on_ssl_errors)
-        frame.loadFinished.connect(  # type: ignore[attr-defined]
-            self._on_frame_load_finished)
-        view.iconChanged.connect(  # type: ignore[attr-defined]
-            self._on_webkit_icon_changed)
-        page.frameCreated.connect(  # type: ignore[attr-defined]
-            self._on_frame_created)
-        frame.contentsSizeChanged.connect(  # type: ignore[attr-defined]
-            self._on_contents_size_changed)
-        frame.initialLayoutCompleted.connect(  # type: ignore[attr-defined]
-            self._on_history_trigger)
-        page.navigation_request.connect(  # type: ignore[attr-defined]
-            self._on_navigation_request)
+        # Cached to avoid crossing the Python -> sip -> Qt boundary on every
+        # use; page and main frame are stable for the lifetime of the widget.
+        self._page = page
+        self._main_frame = frame
+        self._nam = page.networkAccessManager()
+        assert isinstance(self._nam, networkmanager.NetworkManager), self._nam
+        # Child frames are deliberately not hooked up to contentsSizeChanged:
+        # every iframe resize would flow through Python a second time, and
+        # only the main frame's size is of interest.
+        # FIXME:qtwebengine this could theoretically regress:
+        # https://github.com/qutebrowser/qutebrowser/issues/152
+        # https://github.com/qutebrowser/qutebrowser/issues/263
+        # pylint: disable=protected-access
+        connections = [
+            (page.frameCreated,  # type: ignore[attr-defined]
+             self.elements._invalidate_frames_cache),
+            (page.windowCloseRequested,  # type: ignore[attr-defined]
+             self.window_close_requested),
+            (page.linkHovered,  # type: ignore[attr-defined]
+             self._on_link_hovered),
+            (page.loadProgress,  # type: ignore[attr-defined]
+             self._on_load_progress),
+            (page.navigation_request,  # type: ignore[attr-defined]
+             self._on_navigation_request),
+            (frame.loadStarted,  # type: ignore[attr-defined]
+             self._on_load_started),
+            (frame.loadStarted,  # type: ignore[attr-defined]
+             self.elements._invalidate_frames_cache),
+            (frame.loadFinished,  # type: ignore[attr-defined]
+             self._on_load_finished),
+            (frame.contentsSizeChanged,  # type: ignore[attr-defined]
+             self._throttled_contents_size),
+            (frame.initialLayoutCompleted,  # type: ignore[attr-defined]
+             self._on_history_trigger),
+            (view.scroll_pos_changed, self._throttled_scroll_pos),
+            (view.titleChanged,  # type: ignore[attr-defined]
+             self.title_changed),
+            (view.urlChanged,  # type: ignore[attr-defined]
+             self._on_url_changed),
+            (view.shutting_down, self.shutting_down),
+            (view.iconChanged,  # type: ignore[attr-defined]
+             self._on_webkit_icon_changed),
+            (self._nam.sslErrors, self._on_ssl_errors),
+        ]
+        # pylint: enable=protected-access
+        for sig, slot in connections:
+            sig.connect(slot)
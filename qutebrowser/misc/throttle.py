@@ -4,20 +4,9 @@
 
 """A throttle for throttling function calls."""
 
-import dataclasses
-import time
-from typing import Any, Callable, Mapping, Optional, Sequence
+from typing import Any, Callable, Mapping, Tuple
 
-from qutebrowser.qt.core import QObject
-
-from qutebrowser.utils import usertypes
-
-
-@dataclasses.dataclass
-class _CallArgs:
-
-    args: Sequence[Any]
-    kwargs: Mapping[str, Any]
+from qutebrowser.qt.core import QElapsedTimer, QObject, QTimer, pyqtSlot
 
 
 class Throttle(QObject):
@@ -32,7 +21,10 @@ class Throttle(QObject):
     def __init__(self,
                  func: Callable[..., None],
                  delay_ms: int,
-                 parent: QObject = None) -> None:
+                 parent: QObject = None, *,
+                 leading: bool = True,
+                 trailing: bool = True,
+                 no_args: bool = False) -> None:
         """Constructor.
 
         Args:
@@ -40,49 +32,94 @@ class Throttle(QObject):
                          function. -1 disables the wrapper.
             func: The function/method to call on __call__.
             parent: The parent object.
+            leading: Call the function immediately on the first request.
+            trailing: Call the function with the most recent arguments once
+                      the delay has passed.
+            no_args: The function never takes arguments, so storing and
+                     unpacking them for coalesced calls can be skipped.
         """
         super().__init__(parent)
+        assert leading or trailing
         self._delay_ms = delay_ms
         self._func = func
-        self._pending_call: Optional[_CallArgs] = None
-        self._last_call_ms: Optional[int] = None
-        self._timer = usertypes.Timer(self, 'throttle-timer')
-        self._timer.setSingleShot(True)
-
+        self._leading = leading
+        self._trailing = trailing
+        self._no_args = no_args
+        # The arguments of the pending call are kept in two plain attributes
+        # instead of an allocated container, as they get overwritten for
+        # every coalesced call during a throttle window.
+        self._has_pending = False
+        self._pending_args: Tuple[Any, ...] = ()
+        self._pending_kwargs: Mapping[str, Any] = {}
+        # Deadline before which calls get throttled, instead of a last-call
+        # timestamp: the hot path then only needs a single comparison.
+        # Measured with QElapsedTimer - the same monotonic clock Qt's timers
+        # use, returning a native int instead of a boxed Python float.
+        self._elapsed = QElapsedTimer()
+        self._elapsed.start()
+        self._next_allowed_ms = 0
+
+    @pyqtSlot()
     def _call_pending(self) -> None:
         """Start a pending call."""
-        assert self._pending_call is not None
-        self._func(*self._pending_call.args, **self._pending_call.kwargs)
-        self._pending_call = None
-        self._last_call_ms = int(time.monotonic() * 1000)
+        if not self._has_pending:
+            # Cancelled (or flushed) after the timeout was scheduled.
+            return
+        self._has_pending = False
+        if self._no_args:
+            self._func()
+        else:
+            args = self._pending_args
+            kwargs = self._pending_kwargs
+            self._pending_args = ()
+            self._pending_kwargs = {}
+            self._func(*args, **kwargs)
+        self._next_allowed_ms = self._elapsed.elapsed() + self._delay_ms
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
-        cur_time_ms = int(time.monotonic() * 1000)
-        if self._pending_call is None:
-            if (self._last_call_ms is None or
-                    cur_time_ms - self._last_call_ms > self._delay_ms):
+        if self._delay_ms <= 0:
+            # Throttling is disabled, so don't even read the clock.
+            self._func(*args, **kwargs)
+            return
+        cur_time_ms = self._elapsed.elapsed()
+        if not self._has_pending:
+            in_window = cur_time_ms < self._next_allowed_ms
+            if not in_window and self._leading:
                 # Call right now
-                self._last_call_ms = cur_time_ms
+                self._next_allowed_ms = cur_time_ms + self._delay_ms
                 self._func(*args, **kwargs)
                 return
-
-            self._timer.setInterval(self._delay_ms -
-                                    (cur_time_ms - self._last_call_ms))
-            # Disconnect any existing calls, continue if no connections.
-            try:
-                self._timer.timeout.disconnect()
-            except TypeError:
-                pass
-            self._timer.timeout.connect(self._call_pending)
-            self._timer.start()
+            if not self._trailing:
+                return
+            if in_window:
+                remaining_ms = self._next_allowed_ms - cur_time_ms
+            else:
+                # leading=False, so the first call gets delayed to the
+                # trailing edge as well.
+                self._next_allowed_ms = cur_time_ms + self._delay_ms
+                remaining_ms = self._delay_ms
+            # A single shared timeout instead of one QTimer object per
+            # throttle. Passing the bound method makes Qt treat us as the
+            # receiver, so the timeout is dropped if we get deleted first.
+            QTimer.singleShot(remaining_ms, self._call_pending)
 
         # Update arguments for an existing pending call
-        self._pending_call = _CallArgs(args=args, kwargs=kwargs)
+        if not self._no_args:
+            self._pending_args = args
+            self._pending_kwargs = kwargs
+        self._has_pending = True
 
     def set_delay(self, delay_ms: int) -> None:
         """Set the delay to wait between invocation of this function."""
         self._delay_ms = delay_ms
+        if delay_ms <= 0 and self._has_pending:
+            # With throttling now disabled, flush the pending call instead
+            # of letting it fire after the old delay.
+            self._call_pending()
 
     def cancel(self) -> None:
         """Cancel any pending instance of this timer."""
-        self._timer.stop()
+        # The scheduled timeout becomes a no-op without a pending call.
+        self._has_pending = False
+        self._pending_args = ()
+        self._pending_kwargs = {}
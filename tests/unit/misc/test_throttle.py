@@ -39,6 +39,60 @@ def test_immediate_kwargs(throttled, func, qapp):
     func.assert_called_once_with(foo="bar")
 
 
+def test_delay_zero(func, qapp):
+    throttled = throttle.Throttle(func, 0)
+    throttled("foo")
+    throttled("bar")
+    assert func.call_args_list == [mock.call("foo"), mock.call("bar")]
+
+
+def test_set_delay_zero_flushes_pending(func, qapp):
+    throttled = throttle.Throttle(func, DELAY)
+    throttled("foo")
+    throttled("bar")
+    func.assert_called_once_with("foo")
+    func.reset_mock()
+
+    throttled.set_delay(0)
+
+    func.assert_called_once_with("bar")
+
+
+def test_no_args(func, qtbot):
+    throttled = throttle.Throttle(func, DELAY, no_args=True)
+    throttled()
+    throttled()
+    func.assert_called_once_with()
+    func.reset_mock()
+
+    qtbot.wait(2 * DELAY)
+
+    func.assert_called_once_with()
+
+
+def test_no_leading(func, qtbot):
+    throttled = throttle.Throttle(func, DELAY, leading=False)
+    throttled("foo")
+    throttled("bar")
+    func.assert_not_called()
+
+    qtbot.wait(2 * DELAY)
+
+    func.assert_called_once_with("bar")
+
+
+def test_no_trailing(func, qtbot):
+    throttled = throttle.Throttle(func, DELAY, trailing=False)
+    throttled("foo")
+    throttled("bar")
+    func.assert_called_once_with("foo")
+    func.reset_mock()
+
+    qtbot.wait(2 * DELAY)
+
+    func.assert_not_called()
+
+
 def test_delayed(throttled, func, qtbot):
     throttled("foo")
     throttled("foo")